@@ -8,8 +8,9 @@ This script extracts profile pictures from PDF resumes by:
 3. Saving both full page previews and cropped profile picture candidates
 
 Requirements:
-- pdf2image (for PDF to image conversion)
-- Pillow (for image processing)
+- pdftoppm from poppler (for PDF to image conversion)
+- Pillow-SIMD (drop-in Pillow build with SSE4/AVX2 kernels for image processing)
+- NumPy and OpenCV (for edge detection and pixel statistics)
 - PostgreSQL connection for resume metadata
 """
 
@@ -20,20 +21,25 @@ import logging
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Add the project root to Python path
 project_root = Path(__file__).parent.parent
+PROJECT_ROOT_STR = str(project_root) + os.sep
 sys.path.append(str(project_root))
 
 try:
-    from pdf2image import convert_from_path
-    from PIL import Image, ImageFilter, ImageEnhance
+    from PIL import Image, ImageFilter
+    import numpy as np
+    import cv2
     import psycopg2
     from psycopg2.extras import RealDictCursor
 except ImportError as e:
     print(f"❌ Missing required Python package: {e}")
     print("🔧 Install required packages:")
-    print("   pip install pdf2image pillow psycopg2-binary")
+    print("   pip install numpy opencv-python-headless psycopg2-binary")
+    print("   pip uninstall -y pillow && pip install pillow-simd")
     print("   # On Ubuntu/Debian:")
     print("   sudo apt-get install poppler-utils")
     print("   # On macOS:")
@@ -50,9 +56,10 @@ CONFIG = {
     },
     'resumes_dir': project_root / 'resumes',
     'conversion': {
-        'dpi': 200,
-        'format': 'PNG',
-        'first_page_only': True
+        'dpi': 200
+    },
+    'processing': {
+        'max_workers': os.cpu_count() or 1
     },
     'profile_detection': {
         'min_size': 100,
@@ -64,6 +71,9 @@ CONFIG = {
     }
 }
 
+# Slight contrast boost (1.1 around mid-grey) as a per-band lookup table for RGB images
+_CONTRAST_LUT = [max(0, min(255, int(128 + (i - 128) * 1.1))) for i in range(256)] * 3
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(message)s')
 logger = logging.getLogger(__name__)
@@ -85,9 +95,10 @@ class ProfilePictureExtractor:
             conn = psycopg2.connect(CONFIG['database_url'])
             cursor = conn.cursor(cursor_factory=RealDictCursor)
             
+            # Only the source filename is needed, so skip the document text
             cursor.execute("""
-                SELECT id, document, cmetadata 
-                FROM langchain_pg_embedding 
+                SELECT id, cmetadata->>'source' AS source
+                FROM langchain_pg_embedding
                 ORDER BY id DESC
             """)
             
@@ -102,40 +113,76 @@ class ProfilePictureExtractor:
             logger.error(f"❌ Database error: {e}")
             return []
 
-    def convert_pdf_to_image(self, pdf_path: Path, resume_id: str) -> Optional[Tuple[Path, Path]]:
-        """Convert PDF first page to image and save both full and cropped versions"""
+    @staticmethod
+    def render_first_page(pdf_path: Path, resume_id: str) -> Path:
+        """Render the first PDF page as PNG with pdftoppm directly into the previews directory"""
+        output_prefix = CONFIG['output_dirs']['resume_previews'] / f"{resume_id}"
+        
         try:
-            # Convert PDF to image
-            images = convert_from_path(
-                pdf_path,
-                dpi=CONFIG['conversion']['dpi'],
-                first_page_only=CONFIG['conversion']['first_page_only'],
-                fmt=CONFIG['conversion']['format']
+            subprocess.run(
+                [
+                    'pdftoppm',
+                    '-png',
+                    '-r', str(CONFIG['conversion']['dpi']),
+                    '-f', '1',
+                    '-l', '1',
+                    '-singlefile',
+                    str(pdf_path),
+                    str(output_prefix)
+                ],
+                check=True,
+                capture_output=True,
+                text=True
             )
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"pdftoppm exited with status {e.returncode}: {e.stderr.strip()}") from e
+        
+        return CONFIG['output_dirs']['resume_previews'] / f"{resume_id}.png"
+
+    @staticmethod
+    def convert_pdf_to_image(pdf_path: Path, resume_id: str) -> Optional[Tuple[Path, Path]]:
+        """Convert PDF first page to image and save both full and cropped versions"""
+        try:
+            # Skip resumes whose outputs are newer than the source PDF
+            full_page_path = CONFIG['output_dirs']['resume_previews'] / f"{resume_id}.png"
+            profile_pic_path = CONFIG['output_dirs']['profile_pictures'] / f"{resume_id}.png"
+            if (full_page_path.exists() and profile_pic_path.exists()
+                    and pdf_path.stat().st_mtime <= full_page_path.stat().st_mtime):
+                logger.info(f"⏭️  Already up to date: {resume_id}")
+                return full_page_path, profile_pic_path
             
-            if not images:
+            # Render the first page straight to the preview file
+            full_page_path = ProfilePictureExtractor.render_first_page(pdf_path, resume_id)
+            if not full_page_path.exists():
                 return None
                 
-            image = images[0]
-            
-            # Save full page preview
-            full_page_path = CONFIG['output_dirs']['resume_previews'] / f"{resume_id}.png"
-            image.save(full_page_path, 'PNG', quality=95)
+            # Decode the preview once; the grayscale copy is used for scoring
+            page = cv2.imread(str(full_page_path), cv2.IMREAD_COLOR)
+            if page is None:
+                return None
+            gray = cv2.cvtColor(page, cv2.COLOR_BGR2GRAY)
             
             # Extract profile picture candidate
-            profile_pic_path = self.extract_profile_picture(image, resume_id)
+            profile_pic_path = ProfilePictureExtractor.extract_profile_picture(page, gray, resume_id)
             
             logger.info(f"📄 Converted PDF to images: {resume_id}")
             return full_page_path, profile_pic_path
             
         except Exception as e:
+            # Re-raise so the report records the cause, not just the log
             logger.error(f"❌ Error converting PDF for {resume_id}: {e}")
-            return None
+            raise
 
-    def extract_profile_picture(self, image: Image.Image, resume_id: str) -> Optional[Path]:
+    @staticmethod
+    def extract_profile_picture(page: np.ndarray, gray: np.ndarray, resume_id: str) -> Optional[Path]:
         """Extract potential profile picture from resume image"""
         try:
-            width, height = image.size
+            height, width = gray.shape
+            
+            # Run edge detection once on the full page, then build a
+            # summed-area table so each region's mean edge intensity is O(1)
+            edges = cv2.convertScaleAbs(cv2.Laplacian(gray, cv2.CV_16S))
+            edge_integral = cv2.integral(edges, sdepth=cv2.CV_64F)
             
             # Define extraction regions (common profile picture locations)
             regions = [
@@ -171,32 +218,33 @@ class ProfilePictureExtractor:
                 }
             ]
             
-            best_region = None
+            best_box = None
             best_score = 0
             
             for region in regions:
-                cropped = image.crop(region['box'])
-                score = self.analyze_region_for_profile(cropped)
+                score = ProfilePictureExtractor.analyze_region_for_profile(edge_integral, region['box'])
                 
                 if score > best_score:
                     best_score = score
-                    best_region = cropped
+                    best_box = region['box']
             
-            if best_region and best_score > 0.3:  # Threshold for accepting a region
+            if best_box and best_score > 0.3:  # Threshold for accepting a region
                 # Enhance the extracted region
-                enhanced = self.enhance_profile_picture(best_region)
+                enhanced = ProfilePictureExtractor.enhance_profile_picture(
+                    ProfilePictureExtractor.crop_region(page, best_box)
+                )
                 
                 # Save the profile picture candidate
                 profile_pic_path = CONFIG['output_dirs']['profile_pictures'] / f"{resume_id}.png"
-                enhanced.save(profile_pic_path, 'PNG', quality=95)
+                enhanced.save(profile_pic_path, 'PNG', compress_level=1, optimize=False)
                 
                 logger.info(f"🖼️  Extracted profile picture candidate: {resume_id}.png (score: {best_score:.2f})")
                 return profile_pic_path
             else:
                 # Save a default crop from top-right for manual review
-                default_crop = image.crop(regions[0]['box'])
+                default_crop = ProfilePictureExtractor.crop_region(page, regions[0]['box'])
                 profile_pic_path = CONFIG['output_dirs']['profile_pictures'] / f"{resume_id}.png"
-                default_crop.save(profile_pic_path, 'PNG', quality=95)
+                default_crop.save(profile_pic_path, 'PNG', compress_level=1, optimize=False)
                 
                 logger.info(f"📷 Saved default crop for manual review: {resume_id}.png")
                 return profile_pic_path
@@ -205,17 +253,23 @@ class ProfilePictureExtractor:
             logger.error(f"❌ Error extracting profile picture for {resume_id}: {e}")
             return None
 
-    def analyze_region_for_profile(self, image: Image.Image) -> float:
-        """Analyze a region to determine likelihood of containing a profile picture"""
+    @staticmethod
+    def crop_region(page: np.ndarray, box: Tuple[int, int, int, int]) -> Image.Image:
+        """Crop a region of a BGR page array into an RGB PIL image"""
+        x0, y0, x1, y1 = box
+        return Image.fromarray(cv2.cvtColor(page[y0:y1, x0:x1], cv2.COLOR_BGR2RGB))
+
+    @staticmethod
+    def analyze_region_for_profile(edge_integral: np.ndarray, box: Tuple[int, int, int, int]) -> float:
+        """Analyze a region of the page edge map to determine likelihood of containing a profile picture"""
         try:
-            # Convert to grayscale for analysis
-            gray = image.convert('L')
+            x0, y0, x1, y1 = box
             
             # Basic heuristics for profile picture detection
             score = 0.0
             
             # 1. Size check (profile pics are usually not too small or too large)
-            width, height = gray.size
+            width, height = x1 - x0, y1 - y0
             if CONFIG['profile_detection']['min_size'] <= min(width, height) <= CONFIG['profile_detection']['max_size']:
                 score += 0.3
             
@@ -224,10 +278,15 @@ class ProfilePictureExtractor:
             if 0.7 <= aspect_ratio <= 1.3:  # Close to square
                 score += 0.4
             
+            # A region failing both cheap checks can score at most 0.3, which
+            # never clears the acceptance threshold, so skip the edge lookup
+            if score == 0.0:
+                return 0.0
+            
             # 3. Edge detection (faces have distinct edges)
-            edges = gray.filter(ImageFilter.FIND_EDGES)
-            edge_data = list(edges.getdata())
-            edge_intensity = sum(edge_data) / len(edge_data)
+            edge_sum = (edge_integral[y1, x1] - edge_integral[y0, x1]
+                        - edge_integral[y1, x0] + edge_integral[y0, x0])
+            edge_intensity = float(edge_sum) / (width * height)
             
             if 20 <= edge_intensity <= 80:  # Moderate edge intensity suggests structured content
                 score += 0.3
@@ -237,14 +296,15 @@ class ProfilePictureExtractor:
         except Exception:
             return 0.0
 
-    def enhance_profile_picture(self, image: Image.Image) -> Image.Image:
+    @staticmethod
+    def enhance_profile_picture(image: Image.Image) -> Image.Image:
         """Apply basic enhancements to extracted profile picture"""
         try:
             # Resize to standard profile picture size
             target_size = (300, 300)
             
             # Maintain aspect ratio
-            image.thumbnail(target_size, Image.Resampling.LANCZOS)
+            image.thumbnail(target_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
             
             # Create a square canvas
             canvas = Image.new('RGB', target_size, (255, 255, 255))
@@ -254,13 +314,8 @@ class ProfilePictureExtractor:
             y_offset = (target_size[1] - image.height) // 2
             canvas.paste(image, (x_offset, y_offset))
             
-            # Enhance contrast slightly
-            enhancer = ImageEnhance.Contrast(canvas)
-            enhanced = enhancer.enhance(1.1)
-            
-            # Enhance sharpness slightly
-            enhancer = ImageEnhance.Sharpness(enhanced)
-            enhanced = enhancer.enhance(1.1)
+            # Sharpen, then enhance contrast slightly with a single LUT pass
+            enhanced = canvas.filter(ImageFilter.UnsharpMask(radius=1, percent=10)).point(_CONTRAST_LUT)
             
             return enhanced
             
@@ -277,73 +332,92 @@ class ProfilePictureExtractor:
             logger.error("❌ No resumes found or database connection failed")
             return
         
-        success_count = 0
-        error_count = 0
-        
+        # Pre-check failures keep their place so the report stays in database order
+        entries = []
+        jobs = []
         for resume in resumes:
-            try:
-                resume_id = resume['id']
-                cmetadata = resume['cmetadata']
-                
-                logger.info(f"\n🔄 Processing: {resume_id}")
-                
-                # Get source filename
-                source_filename = cmetadata.get('source')
-                if not source_filename:
-                    self.results.append({
-                        'resume_id': resume_id,
-                        'filename': 'unknown',
-                        'success': False,
-                        'error': 'No source filename in metadata'
-                    })
-                    error_count += 1
-                    continue
-                
-                # Check if PDF exists
-                pdf_path = CONFIG['resumes_dir'] / source_filename
-                if not pdf_path.exists():
-                    self.results.append({
-                        'resume_id': resume_id,
-                        'filename': source_filename,
-                        'success': False,
-                        'error': 'PDF file not found'
-                    })
-                    error_count += 1
-                    continue
-                
-                # Convert and extract
-                result = self.convert_pdf_to_image(pdf_path, resume_id)
-                if result:
-                    full_page_path, profile_pic_path = result
-                    self.results.append({
-                        'resume_id': resume_id,
-                        'filename': source_filename,
-                        'success': True,
-                        'full_page_image': str(full_page_path.relative_to(project_root)),
-                        'profile_picture': str(profile_pic_path.relative_to(project_root)) if profile_pic_path else None
-                    })
-                    success_count += 1
-                else:
-                    self.results.append({
-                        'resume_id': resume_id,
-                        'filename': source_filename,
-                        'success': False,
-                        'error': 'Failed to convert PDF to image'
-                    })
-                    error_count += 1
-                    
-            except Exception as e:
-                self.results.append({
-                    'resume_id': resume.get('id', 'unknown'),
-                    'filename': resume.get('cmetadata', {}).get('source', 'unknown'),
+            resume_id = resume['id']
+            
+            # Get source filename
+            source_filename = resume['source']
+            if not source_filename:
+                entries.append({
+                    'resume_id': resume_id,
+                    'filename': 'unknown',
+                    'success': False,
+                    'error': 'No source filename in metadata'
+                })
+                continue
+            
+            # Check if PDF exists
+            pdf_path = CONFIG['resumes_dir'] / source_filename
+            if not pdf_path.exists():
+                entries.append({
+                    'resume_id': resume_id,
+                    'filename': source_filename,
                     'success': False,
-                    'error': str(e)
+                    'error': 'PDF file not found'
                 })
-                error_count += 1
+                continue
+            
+            entries.append(len(jobs))
+            jobs.append((pdf_path, resume_id, source_filename))
+        
+        job_results = self.run_jobs(jobs)
+        for entry in entries:
+            self.results.append(job_results[entry] if isinstance(entry, int) else entry)
+        
+        success_count = sum(1 for r in self.results if r['success'])
+        error_count = len(self.results) - success_count
         
         # Generate report
         self.generate_report(success_count, error_count)
 
+    def run_jobs(self, jobs: List[Tuple[Path, str, str]]) -> List[Dict]:
+        """Convert resumes in worker processes, returning report entries in job order"""
+        results = [None] * len(jobs)
+        lost = []
+        
+        # Each PDF is rendered and analysed independently with distinct output
+        # paths, so the CPU-bound work can be spread over all cores
+        with ProcessPoolExecutor(max_workers=CONFIG['processing']['max_workers'],
+                                 initializer=init_worker) as executor:
+            futures = []
+            for index, job in enumerate(jobs):
+                try:
+                    futures.append((index, executor.submit(process_one_resume, job)))
+                except BrokenProcessPool:
+                    lost.append(index)
+            
+            for index, future in futures:
+                try:
+                    results[index] = future.result()
+                except BrokenProcessPool:
+                    lost.append(index)
+        
+        # A crashed worker breaks every running and queued job, so rerun those
+        # one at a time and only fail the job that crashes again
+        executor = None
+        for index in sorted(lost):
+            pdf_path, resume_id, source_filename = jobs[index]
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=1, initializer=init_worker)
+            try:
+                results[index] = executor.submit(process_one_resume, jobs[index]).result()
+            except BrokenProcessPool as e:
+                results[index] = {
+                    'resume_id': resume_id,
+                    'filename': source_filename,
+                    'success': False,
+                    'error': f'Worker process failed: {e}'
+                }
+                executor.shutdown()
+                executor = None
+        if executor is not None:
+            executor.shutdown()
+        
+        return results
+
     def generate_report(self, success_count: int, error_count: int):
         """Generate and save processing report"""
         logger.info('\n📋 Extraction Summary:')
@@ -382,6 +456,43 @@ class ProfilePictureExtractor:
         logger.info('  - Use full page previews from public/resume-previews/')
         logger.info('  - Consider manual review of profile picture candidates')
 
+def init_worker():
+    """Limit OpenCV to one thread per worker process to avoid oversubscribing cores"""
+    cv2.setNumThreads(1)
+
+def process_one_resume(job: Tuple[Path, str, str]) -> Dict:
+    """Convert a single resume in a worker process and return its report entry"""
+    pdf_path, resume_id, source_filename = job
+    
+    try:
+        logger.info(f"\n🔄 Processing: {resume_id}")
+        
+        # Convert and extract
+        result = ProfilePictureExtractor.convert_pdf_to_image(pdf_path, resume_id)
+        if result:
+            full_page_path, profile_pic_path = result
+            return {
+                'resume_id': resume_id,
+                'filename': source_filename,
+                'success': True,
+                'full_page_image': str(full_page_path).removeprefix(PROJECT_ROOT_STR),
+                'profile_picture': str(profile_pic_path).removeprefix(PROJECT_ROOT_STR) if profile_pic_path else None
+            }
+        return {
+            'resume_id': resume_id,
+            'filename': source_filename,
+            'success': False,
+            'error': 'Failed to convert PDF to image'
+        }
+        
+    except Exception as e:
+        return {
+            'resume_id': resume_id,
+            'filename': source_filename,
+            'success': False,
+            'error': str(e)
+        }
+
 def cleanup_extracted_files():
     """Clean up all extracted files"""
     logger.info("🧹 Cleaning up extracted files...")
@@ -416,8 +527,9 @@ Description:
   Creates both full page previews and cropped profile picture candidates.
 
 Requirements:
-  - pdf2image: pip install pdf2image
-  - Pillow: pip install pillow
+  - Pillow-SIMD: pip uninstall pillow && pip install pillow-simd
+  - NumPy: pip install numpy
+  - OpenCV: pip install opencv-python-headless
   - psycopg2: pip install psycopg2-binary
   - System: poppler-utils (Ubuntu) or poppler (macOS)
             """)